@@ -3,15 +3,24 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
+from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
 import pdb
 import logging
 
+# Serialize figures with orjson (C-accelerated, encodes NumPy arrays natively) instead of the stdlib json encoder
+pio.json.config.default_engine = 'orjson'
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Projection horizon (6 years) and the property appreciation factor (2% annual) for each month
+# since the start or the purchase
+PROJECTION_MONTHS = 72
+APPRECIATION = np.exp(np.arange(PROJECTION_MONTHS) * np.log1p(0.02/12))
+
 # Set page configuration
 st.set_page_config(
     page_title="Singapore Family Finance Planner",
@@ -20,8 +29,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Add custom CSS
-st.markdown("""
+# Add custom CSS. The stylesheet is built once per server process; the markdown element itself
+# still has to be emitted on every rerun since Streamlit does not keep elements between runs.
+@st.cache_resource
+def get_custom_css():
+    return """
 <style>
     .main {
         padding: 2rem;
@@ -43,7 +55,9 @@ st.markdown("""
         color: white;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(get_custom_css(), unsafe_allow_html=True)
 
 # Title and description
 st.title("新加坡家庭财务规划器")
@@ -53,6 +67,192 @@ st.markdown("这个应用程序帮助您规划和可视化未来6年的家庭财
 if 'one_time_expenses' not in st.session_state:
     st.session_state.one_time_expenses = []
 
+def clear_one_time_expenses():
+    st.session_state.one_time_expenses = []
+
+# Fixed monthly payment that repays a loan over n months: P = L[c(1 + c)^n]/[(1 + c)^n - 1]
+# where L is the loan amount and c the monthly interest rate; (1 + c)^n is computed once
+def mortgage_payment(loan, monthly_rate, n):
+    if monthly_rate <= 0:
+        return loan / n
+    growth = (1 + monthly_rate) ** n
+    return loan * monthly_rate * growth / (growth - 1)
+
+# Loan balance for n months of the recurrence L[k+1] = L[k] * (1 + r) - M, via its closed form,
+# clipped at zero once the loan is repaid
+def amortize_balance(loan, monthly_rate, payment, n):
+    payoff_balance = payment / monthly_rate
+    growth = np.power(1 + monthly_rate, np.arange(n))
+    return np.maximum((loan - payoff_balance) * growth + payoff_balance, 0.0)
+
+# Running savings balance: the first month starts from the seed and each later month adds its savings
+def accumulate_savings(seed, savings):
+    return seed + np.cumsum(np.concatenate(([0.0], savings[1:])))
+
+# Build the 6-year monthly projection and its yearly expense averages. Cached on the (hashable)
+# inputs so reruns triggered by unrelated widgets reuse the previous results instead of rebuilding them.
+# one_time_expenses is a tuple of (date, amount) pairs. Only the most recent parameter sets are kept,
+# so sweeping a slider doesn't grow the cache without bound.
+@st.cache_data(max_entries=16)
+def build_projection(start_date, initial_funds, monthly_income, monthly_expenses, monthly_child_expenses,
+                     annual_insurance, annual_tax, annual_bonus,
+                     childcare_monthly, preschool_monthly, primary_school_monthly, child_birth_date,
+                     housing_status, monthly_mortgage, property_value, outstanding_loan,
+                     house_purchase_date, house_price, down_payment, loan_amount, interest_rate,
+                     total_taxes_fees, one_time_expenses):
+    # Month-start stamps, so dates truncated to the first of their month line up with the index
+    months = pd.date_range(start=start_date, periods=PROJECTION_MONTHS, freq='MS')
+    n_months = len(months)
+    
+    # Every column is built as a plain NumPy array and wrapped in a DataFrame once at the end
+    year = months.year.to_numpy()
+    month = months.month.to_numpy()
+    
+    # Calculate child age in months at each point as a difference of monthly period ordinals
+    birth_period = pd.Period(child_birth_date, freq='M')
+    age = months.to_period('M').astype('int64').to_numpy() - birth_period.ordinal
+    
+    # Handle mortgage based on housing status
+    mortgage = np.zeros(n_months)
+    property_values = np.zeros(n_months)
+    outstanding_loans = np.zeros(n_months)
+    one_time = np.zeros(n_months)
+    housing_columns = {}
+    
+    month_offsets = np.arange(n_months)
+    
+    if housing_status == "已购房":
+        mortgage[:] = monthly_mortgage
+        
+        # Set property value (with 2% annual appreciation)
+        property_values = property_value * APPRECIATION
+        
+        # Calculate equity (property value minus outstanding loan)
+        # Loan decreases by the full mortgage payment each month (simplified principal estimate)
+        monthly_principal = max(monthly_mortgage, 0)
+        outstanding_loans = np.maximum(outstanding_loan - monthly_principal * month_offsets, 0.0)
+        
+    elif housing_status == "计划购房":
+        purchase_month = pd.Period(house_purchase_date, freq='M').to_timestamp()
+        
+        logger.info(f"Purchase index: {purchase_month}, df.index: {months}")
+        
+        # Fix: Find the closest date AFTER the purchase_month. The index is sorted, so the
+        # first date that's on or after the purchase month comes from a binary search
+        purchase_index = months.searchsorted(purchase_month)
+        if purchase_index >= n_months:
+            logger.warning(f"No future dates available after {purchase_month}. Housing purchase may not be reflected in projections.")
+        else:
+            if months[purchase_index] != purchase_month:
+                logger.info(f"Purchase month {purchase_month} not found in index. Using next available date: {months[purchase_index]}")
+            logger.info(f"Purchase index: {purchase_index}")
+            
+            # Add down payment and taxes/fees as one-time expenses
+            one_time[purchase_index] += down_payment + total_taxes_fees
+            
+            # Add special columns to track these major expenses
+            housing_columns['HousingDownPayment'] = np.zeros(n_months)
+            housing_columns['HousingDownPayment'][purchase_index] = down_payment
+            housing_columns['HousingTaxesFees'] = np.zeros(n_months)
+            housing_columns['HousingTaxesFees'][purchase_index] = total_taxes_fees
+            
+            # Apply mortgage payments after purchase date
+            mortgage[purchase_index:] = monthly_mortgage
+            
+            # Set property value (with 2% annual appreciation)
+            property_values[purchase_index:] = house_price * APPRECIATION[:n_months - purchase_index]
+            
+            # Calculate outstanding loan for each month
+            monthly_interest_rate = interest_rate / 100 / 12
+            if monthly_interest_rate > 0:
+                outstanding_loans[purchase_index:] = amortize_balance(
+                    loan_amount, monthly_interest_rate, monthly_mortgage, n_months - purchase_index)
+    
+    # Apply education expenses based on child's age:
+    # childcare (6 months to 4 years), preschool (4 to 7 years), primary school (7 years and above)
+    education = np.select(
+        [(age >= 6) & (age < 48), (age >= 48) & (age < 84), age >= 84],
+        [childcare_monthly, preschool_monthly, primary_school_monthly],
+        default=0.0
+    )
+    
+    # Regular child expenses only after birth
+    child_expenses = np.where(age >= 0, monthly_child_expenses, 0.0)
+    
+    # Expenses that are the same every month stay scalars; annual ones are divided by 12
+    fixed_expenses = monthly_expenses + annual_insurance / 12 + annual_tax / 12
+    
+    # Annual bonus (only in December)
+    bonus = np.where(month == 12, annual_bonus, 0.0)
+    
+    # Add one-time expenses to the financial projection, summed per month
+    if one_time_expenses:
+        expense_dates, expense_amounts = zip(*one_time_expenses)
+        # Truncate to month in one datetime64 cast and scatter into the matching rows
+        floors = np.array(expense_dates, dtype='datetime64[D]').astype('datetime64[M]')
+        month_floors = months.values.astype('datetime64[M]')
+        in_range = np.isin(floors, month_floors)
+        positions = np.searchsorted(month_floors, floors[in_range])
+        np.add.at(one_time, positions, np.asarray(expense_amounts, dtype=np.float64)[in_range])
+    
+    # Calculate total monthly expenses and savings
+    total_expenses = fixed_expenses + mortgage + child_expenses + education + one_time
+    monthly_savings = monthly_income + bonus - total_expenses
+    
+    # Calculate cumulative savings to account for housing purchase
+    cumulative_savings = accumulate_savings(initial_funds, monthly_savings)
+    
+    # Property columns only exist with an owned or planned home; without one they would be all
+    # zeros (and TotalAssets a copy of CumulativeSavings) that no table column or chart uses
+    property_columns = {}
+    if housing_status in ["已购房", "计划购房"]:
+        # Calculate property equity (property value minus outstanding loan)
+        property_equity = property_values - outstanding_loans
+        property_columns = {
+            'PropertyValue': property_values,
+            'OutstandingLoan': outstanding_loans,
+            'PropertyEquity': property_equity,
+            # Calculate total assets (savings + property equity)
+            'TotalAssets': cumulative_savings + property_equity,
+        }
+    
+    df = pd.DataFrame({
+        # Calendar and age columns are small integers; money columns stay float64, since float32
+        # keeps only ~7 significant digits and would drop cents on property values
+        'Year': year.astype(np.int16),
+        'Month': month.astype(np.int8),
+        'ChildAgeMonths': age.astype(np.int16),
+        'MonthlyMortgage': mortgage,
+        **housing_columns,
+        'TotalEducationExpenses': education,
+        'MonthlyChildExpenses': child_expenses,
+        'Bonus': bonus,
+        'OneTimeExpenses': one_time,
+        'TotalMonthlyExpenses': total_expenses,
+        'MonthlySavings': monthly_savings,
+        'CumulativeSavings': cumulative_savings,
+        **property_columns,
+    }, index=months)
+    
+    # Group by year: average monthly expenses, total one-time expenses (and purchase costs). The months
+    # are in order, so each year is a contiguous run of rows and np.add.reduceat sums it directly
+    year_starts = np.flatnonzero(np.r_[True, year[1:] != year[:-1]])
+    months_per_year = np.diff(np.append(year_starts, n_months))
+    yearly_expenses = pd.DataFrame({
+        'Year': year[year_starts].astype(np.int16),
+        'MonthlyMortgage': np.add.reduceat(mortgage, year_starts) / months_per_year,
+        'MonthlyChildExpenses': np.add.reduceat(child_expenses, year_starts) / months_per_year,
+        'TotalEducationExpenses': np.add.reduceat(education, year_starts) / months_per_year,
+        'OneTimeExpenses': np.add.reduceat(one_time, year_starts),
+        **{col: np.add.reduceat(values, year_starts) for col, values in housing_columns.items()},
+        # Constant monthly amounts have the same average every year
+        'MonthlyExpenses': monthly_expenses,
+        'MonthlyInsurance': annual_insurance / 12,
+        'MonthlyTax': annual_tax / 12
+    })
+    
+    return df, yearly_expenses
+
 # Sidebar for inputs
 with st.sidebar:
     st.header("基本财务信息")
@@ -66,8 +266,17 @@ with st.sidebar:
     
     logger.info(f"Processing housing status: {housing_status}")
     
+    # Defaults for inputs that only exist under some housing statuses
+    property_value = outstanding_loan = 0.0
+    house_purchase_date = None
+    house_price = down_payment = loan_amount = interest_rate = total_taxes_fees = total_cash_outlay = 0.0
+    
     if housing_status == "已购房":
         monthly_mortgage = st.number_input("月房贷 (SGD)", min_value=0.0, value=1500.0, step=100.0)
+        
+        # For already purchased homes, ask for property value and outstanding loan
+        property_value = st.number_input("房产当前市值 (SGD)", min_value=0.0, value=500000.0, step=10000.0)
+        outstanding_loan = st.number_input("剩余贷款金额 (SGD)", min_value=0.0, value=300000.0, step=10000.0)
     elif housing_status == "计划购房":
         house_purchase_date = st.date_input("计划购房日期", value=datetime(2025, 5, 1))
         house_price = st.number_input("房屋总价 (SGD)", min_value=0.0, value=1700000.0, step=10000.0)
@@ -79,14 +288,10 @@ with st.sidebar:
         loan_years = st.slider("贷款年限", min_value=5, max_value=30, value=20)
         interest_rate = st.slider("年利率 (%)", min_value=1.0, max_value=5.0, value=2.5, step=0.1)
         
-        # Calculate monthly mortgage payment using the formula: P = L[c(1 + c)^n]/[(1 + c)^n - 1]
-        # where P is payment, L is loan amount, c is monthly interest rate, n is number of payments
+        # Calculate monthly mortgage payment
         monthly_interest_rate = interest_rate / 100 / 12
         total_payments = loan_years * 12
-        if monthly_interest_rate > 0:
-            monthly_mortgage = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** total_payments) / ((1 + monthly_interest_rate) ** total_payments - 1)
-        else:
-            monthly_mortgage = loan_amount / total_payments
+        monthly_mortgage = mortgage_payment(loan_amount, monthly_interest_rate, total_payments)
         
         st.write(f"预计月供: ${monthly_mortgage:.2f}")
         
@@ -104,15 +309,14 @@ with st.sidebar:
         # Next $180,000: 2%
         # Next $640,000: 3%
         # Remaining amount: 4%
+        # Each bracket's taxable slice is clipped from the price, so the same expression also works
+        # element-wise on an array of prices
+        bsd_thresholds = np.array([0, 180000, 360000, 1000000, np.inf])
+        bsd_rates = np.array([0.01, 0.02, 0.03, 0.04])
         def calculate_bsd(price):
-            if price <= 180000:
-                return price * 0.01
-            elif price <= 360000:
-                return 180000 * 0.01 + (price - 180000) * 0.02
-            elif price <= 1000000:
-                return 180000 * 0.01 + 180000 * 0.02 + (price - 360000) * 0.03
-            else:
-                return 180000 * 0.01 + 180000 * 0.02 + 640000 * 0.03 + (price - 1000000) * 0.04
+            price = np.asarray(price, dtype=np.float64)
+            taxable = np.clip(price[..., None] - bsd_thresholds[:-1], 0, np.diff(bsd_thresholds))
+            return (taxable * bsd_rates).sum(axis=-1)
         
         bsd = calculate_bsd(house_price)
         st.write(f"买方印花税 (BSD): ${bsd:,.2f}")
@@ -191,256 +395,83 @@ with st.sidebar:
 # Main content area with tabs
 tab1, tab2, tab3 = st.tabs(["财务规划", "一次性支出", "图表分析"])
 
-with tab1:
-    st.header("6年财务规划")
-    
-    # Calculate start date and generate month range
-    start_date = datetime.now().replace(day=1)
-    months = pd.date_range(start=start_date, periods=72, freq='M')
-    
-    # Create dataframe for financial projection
-    df = pd.DataFrame(index=months)
-    df['Year'] = df.index.year
-    df['Month'] = df.index.month
-    df['MonthName'] = df.index.strftime('%b')
-    
-    # Calculate child age in months at each point
-    child_birth_date_dt = pd.to_datetime(child_birth_date)
-    df['ChildAgeMonths'] = ((df.index.year - child_birth_date_dt.year) * 12 + 
-                           df.index.month - child_birth_date_dt.month)
+# One-time expenses are collected first so the projection below includes any just submitted
+with tab2:
+    st.header("添加一次性支出")
     
-    # Basic monthly calculations
-    df['MonthlyIncome'] = monthly_income
-    
-    # Handle mortgage based on housing status
-    df['MonthlyMortgage'] = 0.0
-    df['PropertyValue'] = 0.0  # Add property value column
-    df['PropertyEquity'] = 0.0  # Add property equity column
-    df['OutstandingLoan'] = 0.0  # Initialize OutstandingLoan column for all scenarios
+    # Form for adding one-time expenses
+    with st.form("one_time_expense_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            expense_name = st.text_input("支出名称", placeholder="例如: 产检费用")
+            expense_amount = st.number_input("金额 (SGD)", min_value=0.0, value=1000.0, step=100.0)
+        with col2:
+            expense_date = st.date_input("日期", value=datetime.now() + timedelta(days=30))
+            expense_category = st.selectbox("类别", 
+                                          ["产检费用", "生育费用", "坐月子费用", "教育费用", "房屋相关", "其他"])
+        
+        submit_button = st.form_submit_button("添加支出")
+        
+        if submit_button and expense_name and expense_amount > 0:
+            st.session_state.one_time_expenses.append({
+                "name": expense_name,
+                "amount": expense_amount,
+                "date": expense_date,
+                "category": expense_category
+            })
+            st.success(f"已添加: {expense_name} - ${expense_amount:.2f}")
     
-    if housing_status == "已购房":
-        df['MonthlyMortgage'] = monthly_mortgage
-        
-        # For already purchased homes, ask for property value and outstanding loan
-        property_value = st.sidebar.number_input("房产当前市值 (SGD)", min_value=0.0, value=500000.0, step=10000.0)
-        outstanding_loan = st.sidebar.number_input("剩余贷款金额 (SGD)", min_value=0.0, value=300000.0, step=10000.0)
-        
-        # Set property value (with 2% annual appreciation)
-        months = np.arange(len(df))
-        df['PropertyValue'] = property_value * np.power(1 + 0.02/12, months)
-        
-        # Calculate equity (property value minus outstanding loan)
-        # Loan decreases with each payment
-        monthly_principal = 0
-        if monthly_mortgage > 0:
-            # Estimate monthly principal payment (simplified)
-            remaining_months = outstanding_loan / monthly_mortgage
-            monthly_principal = outstanding_loan / remaining_months
-        
-        # Initialize outstanding loan for each month
-        current_loan = outstanding_loan
-        
-        for i in range(len(df)):
-            if i == 0:
-                df.loc[df.index[i], 'OutstandingLoan'] = current_loan
-            else:
-                current_loan = max(0, current_loan - monthly_principal)
-                df.loc[df.index[i], 'OutstandingLoan'] = current_loan
-        
-        df['PropertyEquity'] = df['PropertyValue'] - df['OutstandingLoan']
-        
-    elif housing_status == "计划购房":
-        house_purchase_date_dt = pd.to_datetime(house_purchase_date)
-        purchase_month = house_purchase_date_dt.replace(day=1)
-        
-        # Add down payment and taxes/fees as one-time expenses
-        if 'OneTimeExpenses' not in df.columns:
-            df['OneTimeExpenses'] = 0.0
-        
-        logger.info(f"Purchase index: {purchase_month}, df.index: {df.index}")
-        
-        # Fix: Find the closest date AFTER the purchase_month
-        if purchase_month not in df.index:
-            # Get all dates that are on or after the purchase month
-            future_dates = [date for date in df.index if date >= purchase_month]
-            
-            if future_dates:
-                # Get the first date that's on or after the purchase month
-                closest_date = min(future_dates)
-                logger.info(f"Purchase month {purchase_month} not found in index. Using next available date: {closest_date}")
-                purchase_month = closest_date
-            else:
-                logger.warning(f"No future dates available after {purchase_month}. Housing purchase may not be reflected in projections.")
+    # Display and manage one-time expenses
+    if st.session_state.one_time_expenses:
+        st.subheader("已添加的一次性支出")
+        
+        expense_df = pd.DataFrame(st.session_state.one_time_expenses)
+        expense_df['date'] = pd.to_datetime(expense_df['date'])
+        expense_df = expense_df.sort_values('date')
+        
+        # Display expenses in a table
+        st.dataframe(
+            expense_df.rename(columns={
+                "name": "名称",
+                "amount": "金额 (SGD)",
+                "date": "日期",
+                "category": "类别"
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
         
-        if purchase_month in df.index:
-            # Add down payment
-            df.loc[purchase_month, 'OneTimeExpenses'] += down_payment
-            
-            # Add taxes and fees
-            df.loc[purchase_month, 'OneTimeExpenses'] += total_taxes_fees
-            
-            # Add special columns to track these major expenses
-            if 'HousingDownPayment' not in df.columns:
-                df['HousingDownPayment'] = 0.0
-            df.loc[purchase_month, 'HousingDownPayment'] = down_payment
-            
-            if 'HousingTaxesFees' not in df.columns:
-                df['HousingTaxesFees'] = 0.0
-            df.loc[purchase_month, 'HousingTaxesFees'] = total_taxes_fees
-            
-            # Apply mortgage payments after purchase date
-            mortgage_mask = df.index >= purchase_month
-            df.loc[mortgage_mask, 'MonthlyMortgage'] = monthly_mortgage
-            
-            # Set property value (with 2% annual appreciation)
-            purchase_index = df.index.get_loc(purchase_month)
-            logger.info(f"Purchase index: {purchase_index}")
-            for i in range(len(df)):
-                if i >= purchase_index:
-                    months_since_purchase = i - purchase_index
-                    df.loc[df.index[i], 'PropertyValue'] = house_price * (1 + 0.02/12) ** months_since_purchase
-            
-            # Calculate outstanding loan for each month
-            current_loan = loan_amount
-            
-            # Calculate monthly principal payment
-            monthly_interest_rate = interest_rate / 100 / 12
-            if monthly_interest_rate > 0:
-                for i in range(len(df)):
-                    if i >= purchase_index:
-                        if i == purchase_index:
-                            df.loc[df.index[i], 'OutstandingLoan'] = current_loan
-                        else:
-                            # Calculate interest portion
-                            interest_payment = current_loan * monthly_interest_rate
-                            principal_payment = monthly_mortgage - interest_payment
-                            current_loan = max(0, current_loan - principal_payment)
-                            df.loc[df.index[i], 'OutstandingLoan'] = current_loan
-            
-            # Calculate property equity (property value minus outstanding loan)
-            df['PropertyEquity'] = df['PropertyValue'] - df['OutstandingLoan']
-    
-    df['MonthlyExpenses'] = monthly_expenses
-    
-    # Child expenses based on age
-    df['ChildcareExpense'] = 0.0
-    df['PreschoolExpense'] = 0.0
-    df['PrimarySchoolExpense'] = 0.0
-    
-    # Apply education expenses based on child's age
-    # Childcare (6 months to 4 years)
-    childcare_mask = (df['ChildAgeMonths'] >= 6) & (df['ChildAgeMonths'] < 48)
-    df.loc[childcare_mask, 'ChildcareExpense'] = childcare_monthly
-    
-    # Preschool (4 years to 7 years)
-    preschool_mask = (df['ChildAgeMonths'] >= 48) & (df['ChildAgeMonths'] < 84)
-    df.loc[preschool_mask, 'PreschoolExpense'] = preschool_monthly
-    
-    # Primary school (7 years and above)
-    primary_mask = df['ChildAgeMonths'] >= 84
-    df.loc[primary_mask, 'PrimarySchoolExpense'] = primary_school_monthly
-    
-    # Regular child expenses only after birth
-    df['MonthlyChildExpenses'] = np.where(df['ChildAgeMonths'] >= 0, monthly_child_expenses, 0)
-    
-    # Annual expenses (divided by 12 for monthly impact)
-    df['MonthlyInsurance'] = annual_insurance / 12
-    df['MonthlyTax'] = annual_tax / 12
-    
-    # Annual bonus (only in December)
-    df['Bonus'] = 0.0
-    df.loc[df['Month'] == 12, 'Bonus'] = annual_bonus
+        # Add button to clear all expenses; the callback runs before the rerun triggered
+        # by the click, so that rerun already sees the empty list
+        st.button("清除所有一次性支出", on_click=clear_one_time_expenses)
+    else:
+        st.info("尚未添加任何一次性支出")
 
-    # Function to add one-time expenses
-    with tab2:
-        st.header("添加一次性支出")
-        
-        # Form for adding one-time expenses
-        with st.form("one_time_expense_form"):
-            col1, col2 = st.columns(2)
-            with col1:
-                expense_name = st.text_input("支出名称", placeholder="例如: 产检费用")
-                expense_amount = st.number_input("金额 (SGD)", min_value=0.0, value=1000.0, step=100.0)
-            with col2:
-                expense_date = st.date_input("日期", value=datetime.now() + timedelta(days=30))
-                expense_category = st.selectbox("类别", 
-                                              ["产检费用", "生育费用", "坐月子费用", "教育费用", "房屋相关", "其他"])
-            
-            submit_button = st.form_submit_button("添加支出")
-            
-            if submit_button and expense_name and expense_amount > 0:
-                st.session_state.one_time_expenses.append({
-                    "name": expense_name,
-                    "amount": expense_amount,
-                    "date": expense_date,
-                    "category": expense_category
-                })
-                st.success(f"已添加: {expense_name} - ${expense_amount:.2f}")
-        
-        # Display and manage one-time expenses
-        if st.session_state.one_time_expenses:
-            st.subheader("已添加的一次性支出")
-            
-            expense_df = pd.DataFrame(st.session_state.one_time_expenses)
-            expense_df['date'] = pd.to_datetime(expense_df['date'])
-            expense_df = expense_df.sort_values('date')
-            
-            # Display expenses in a table
-            st.dataframe(
-                expense_df.rename(columns={
-                    "name": "名称",
-                    "amount": "金额 (SGD)",
-                    "date": "日期",
-                    "category": "类别"
-                }),
-                hide_index=True,
-                use_container_width=True
-            )
-            
-            # Add button to clear all expenses
-            if st.button("清除所有一次性支出"):
-                st.session_state.one_time_expenses = []
-                st.experimental_rerun()
-            
-            # Add one-time expenses to the financial projection
-            for _, expense in expense_df.iterrows():
-                expense_month = expense['date'].replace(day=1)
-                if expense_month in df.index:
-                    if 'OneTimeExpenses' not in df.columns:
-                        df['OneTimeExpenses'] = 0.0
-                    df.loc[expense_month, 'OneTimeExpenses'] += expense['amount']
-        else:
-            st.info("尚未添加任何一次性支出")
-    
-    # If OneTimeExpenses column doesn't exist, create it with zeros
-    if 'OneTimeExpenses' not in df.columns:
-        df['OneTimeExpenses'] = 0.0
-    
-    # Calculate total monthly expenses and savings
-    df['TotalEducationExpenses'] = df['ChildcareExpense'] + df['PreschoolExpense'] + df['PrimarySchoolExpense']
-    df['TotalMonthlyExpenses'] = (df['MonthlyMortgage'] + df['MonthlyExpenses'] + 
-                                 df['MonthlyChildExpenses'] + df['MonthlyInsurance'] + 
-                                 df['MonthlyTax'] + df['TotalEducationExpenses'] + 
-                                 df['OneTimeExpenses'])
-    
-    df['MonthlySavings'] = df['MonthlyIncome'] + df['Bonus'] - df['TotalMonthlyExpenses']
-    
-    # Calculate cumulative savings
-    df['CumulativeSavings'] = initial_funds
+# Calculate the projection once per rerun and reuse it in tab1 and tab3
+start_date = datetime.now().date().replace(day=1)
+one_time_expenses = tuple((expense["date"], expense["amount"]) for expense in st.session_state.one_time_expenses)
+projection_params = (
+    start_date, initial_funds, monthly_income, monthly_expenses, monthly_child_expenses,
+    annual_insurance, annual_tax, annual_bonus,
+    childcare_monthly, preschool_monthly, primary_school_monthly, child_birth_date,
+    housing_status, monthly_mortgage, property_value, outstanding_loan,
+    house_purchase_date, house_price, down_payment, loan_amount, interest_rate,
+    total_taxes_fees, one_time_expenses
+)
 
-    # Recalculate cumulative savings to account for housing purchase
-    for i in range(1, len(df)):
-        df.loc[df.index[i], 'CumulativeSavings'] = df.loc[df.index[i-1], 'CumulativeSavings'] + df.loc[df.index[i], 'MonthlySavings']
+# Reuse this session's last projection when its inputs are unchanged (e.g. tab switches or edits to
+# the expense form), skipping even the cache lookup; build_projection's cache covers earlier inputs
+if st.session_state.get('projection_params') != projection_params:
+    st.session_state.projection = build_projection(*projection_params)
+    st.session_state.projection_params = projection_params
+df, yearly_expenses = st.session_state.projection
 
-    # Calculate total assets (savings + property equity)
-    df['TotalAssets'] = df['CumulativeSavings'] + df['PropertyEquity']
+with tab1:
+    st.header("6年财务规划")
     
     # Display the financial projection table
     st.subheader("月度财务预测")
     
-    # Format the dataframe for display
-    display_df = df.copy()
-    
     # Define columns based on housing status to avoid KeyError
     base_columns = [
         'Year', 'MonthName', 'MonthlyIncome', 'Bonus', 'MonthlyMortgage', 
@@ -452,8 +483,6 @@ with tab1:
     property_columns = ['PropertyValue', 'OutstandingLoan', 'PropertyEquity', 'TotalAssets']
     display_columns = base_columns + [col for col in property_columns if col in df.columns]
     
-    display_df = display_df[display_columns]
-    
     # Define column names mapping
     column_names = {
         'Year': '年份', 
@@ -467,631 +496,720 @@ with tab1:
         'OneTimeExpenses': '一次性支出', 
         'TotalMonthlyExpenses': '总支出', 
         'MonthlySavings': '月度储蓄', 
-        'CumulativeSavings': '累计储蓄'
+        'CumulativeSavings': '累计储蓄',
+        'PropertyValue': '房产价值',
+        'OutstandingLoan': '剩余贷款',
+        'PropertyEquity': '房产净值',
+        'TotalAssets': '总资产'
     }
     
-    # Add property column names if they exist
-    if 'PropertyValue' in display_df.columns:
-        column_names['PropertyValue'] = '房产价值'
-    if 'OutstandingLoan' in display_df.columns:
-        column_names['OutstandingLoan'] = '剩余贷款'
-    if 'PropertyEquity' in display_df.columns:
-        column_names['PropertyEquity'] = '房产净值'
-    if 'TotalAssets' in display_df.columns:
-        column_names['TotalAssets'] = '总资产'
-    
-    # Rename columns
-    display_df.columns = [column_names.get(col, col) for col in display_df.columns]
-    
-    # Format numbers to 2 decimal places
-    for col in display_df.columns:
-        if col not in ['年份', '月份']:
-            display_df[col] = display_df[col].map('${:,.2f}'.format)
-    
-    st.dataframe(display_df, use_container_width=True)
+    # Select and rename only the displayed columns instead of copying the whole frame.
+    # Month names and constant monthly amounts are not stored in df, so they are inserted at their display position.
+    derived_columns = {'MonthName': df.index.strftime('%b'),
+                       'MonthlyIncome': monthly_income, 'MonthlyExpenses': monthly_expenses}
+    display_df = df[[col for col in display_columns if col not in derived_columns]].rename(columns=column_names)
+    for col, value in derived_columns.items():
+        display_df.insert(display_columns.index(col), column_names[col], value)
+    
+    # Format numbers to 2 decimal places in the front end so the table stays numeric (and sorts numerically)
+    number_columns = {col: st.column_config.NumberColumn(format="$%.2f")
+                      for col in display_df.columns if col not in ['年份', '月份']}
+    
+    st.dataframe(display_df, use_container_width=True, column_config=number_columns)
 
-with tab3:
-    st.header("财务图表分析")
+# Chart builders. Each figure is cached on the inputs it is drawn from, so a rerun whose
+# inputs are unchanged replays the cached figure instead of rebuilding every trace. Like the
+# projection, each builder keeps only its 16 most recent entries.
+
+# Chart x values as a datetime64 array, which Plotly serializes directly (no per-date strftime);
+# the initial-funds marker sits half a month before the first projected month. Single points
+# (markers, shapes, annotations) take Timestamps from df.index: a bare numpy.datetime64 scalar
+# would be serialized as integer nanoseconds.
+def get_chart_dates(index):
+    chart_dates = index.to_numpy()
+    initial_date = index[0] - pd.Timedelta(days=15)
+    return chart_dates, initial_date
+
+# Largest-Triangle-Three-Buckets downsampling for line traces: series longer than 1000 points are
+# reduced to n_out points that keep the line's visual shape (the 72-month projection is drawn as is).
+# In each bucket the point forming the largest triangle with the previously kept point and the
+# next bucket's average is kept; the first and last points are always kept.
+def downsample_lttb(x, y, n_out=1500):
+    n = len(y)
+    if n <= 1000 or n <= n_out:
+        return x, y
+    x_values = x.astype('datetime64[ns]').astype(np.int64) if x.dtype.kind == 'M' else x
+    x_values = np.asarray(x_values, dtype=np.float64)
+    bucket_edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    bucket_edges[-1] = n - 1
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for b in range(n_out - 2):
+        start, end = bucket_edges[b], bucket_edges[b + 1]
+        next_end = bucket_edges[b + 2] if b + 2 < len(bucket_edges) else n
+        next_x = x_values[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = np.abs((x_values[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x_values[previous] - x_values[start:end]) * (next_y - y[previous]))
+        previous = start + np.argmax(areas)
+        selected[b + 1] = previous
+    return x[selected], y[selected]
+
+# x/y keyword arguments for a line trace, downsampled when the series is long
+def line_xy(x, y):
+    x, y = downsample_lttb(x, y)
+    return dict(x=x, y=y)
+
+# Row position of a month-start Timestamp in the (sorted, month-start) projection index,
+# or None when the month is missing or outside the projection
+def month_position(index, month):
+    if month is None:
+        return None
+    position = index.searchsorted(month)
+    if position < len(index) and index[position] == month:
+        return position
+    return None
+
+# Cash savings with the housing purchase, child milestones and child-related one-time expenses.
+# purchase_month is None unless a purchase is planned; expense_records are (name, amount, date, category).
+@st.cache_data(max_entries=16)
+def make_events_figure(df, initial_funds, purchase_month, total_cash_outlay, child_status, child_birth_date,
+                       expense_records):
+    annotations, shapes = [], []  # Layout annotations and shapes, passed with the traces at the end
+    event_traces = []  # Traces are collected and added to the figure in one batch
     
-    # Create multiple charts
-    col1, col2 = st.columns(2)
+    chart_dates, initial_date = get_chart_dates(df.index)
+    savings = df['CumulativeSavings'].to_numpy()
     
-    with col1:
-        # Cash Savings with Key Events
-        st.subheader("现金储蓄变化与重大事件")
-        
-        fig_events = go.Figure()
-        
-        # Convert datetime to string for plotly to avoid orjson issues
-        date_strings = [d.strftime('%Y-%m-%d') for d in df.index]
-        initial_date_str = (df.index[0] - pd.Timedelta(days=15)).strftime('%Y-%m-%d')
-        
-        # Add a marker for initial funds
-        fig_events.add_trace(go.Scatter(
-            x=[initial_date_str],  # Use string format instead of datetime
-            y=[initial_funds],
-            name='初始资金',
+    # Add a marker for initial funds
+    event_traces.append(dict(
+        type='scattergl',
+        x=[initial_date],
+        y=[initial_funds],
+        name='初始资金',
+        mode='markers',
+        marker=dict(size=12, color='green', symbol='diamond')
+    ))
+    
+    # Add cumulative savings line
+    event_traces.append(dict(
+        type='scattergl',
+        **line_xy(chart_dates, savings),
+        name='累计储蓄',
+        line=dict(color='blue', width=3)
+    ))
+    
+    # Add annotation for initial funds
+    annotations.append(dict(
+        x=initial_date,
+        y=initial_funds,
+        text=f"初始资金: ${initial_funds:,.2f}",
+        showarrow=True,
+        arrowhead=1,
+        ax=-40,
+        ay=-40
+    ))
+    
+    # Add markers and annotations for housing purchase
+    purchase_idx = month_position(df.index, purchase_month)
+    if purchase_idx is not None:
+        # Get savings value right before purchase
+        pre_purchase_savings = savings[purchase_idx]
+        
+        # Get savings value right after purchase (after down payment and fees)
+        post_purchase_savings = pre_purchase_savings - total_cash_outlay
+        
+        # Add markers for pre and post purchase
+        event_traces.append(dict(
+            type='scattergl',
+            x=[purchase_month],
+            y=[pre_purchase_savings],
+            name='购房前储蓄',
             mode='markers',
-            marker=dict(size=12, color='green', symbol='diamond')
+            marker=dict(size=12, color='orange', symbol='circle')
         ))
         
-        # Add cumulative savings line
-        fig_events.add_trace(go.Scatter(
-            x=date_strings,  # Use string format instead of datetime
-            y=df['CumulativeSavings'],
-            name='累计储蓄',
-            line=dict(color='blue', width=3)
+        event_traces.append(dict(
+            type='scattergl',
+            x=[purchase_month],
+            y=[post_purchase_savings],
+            name='购房后储蓄',
+            mode='markers',
+            marker=dict(size=12, color='red', symbol='circle')
         ))
         
-        # Add annotation for initial funds
-        fig_events.add_annotation(
-            x=initial_date_str,
-            y=initial_funds,
-            text=f"初始资金: ${initial_funds:,.2f}",
+        # Add annotation for housing purchase
+        annotations.append(dict(
+            x=purchase_month,
+            y=(pre_purchase_savings + post_purchase_savings) / 2,
+            text=f"购房支出: ${total_cash_outlay:,.2f}",
             showarrow=True,
-            arrowhead=1,
-            ax=-40,
-            ay=-40
-        )
-        
-        # Add markers and annotations for housing purchase
-        if housing_status == "计划购房":
-            house_purchase_date_dt = pd.to_datetime(house_purchase_date)
-            purchase_month = house_purchase_date_dt.replace(day=1)
-            
-            if purchase_month in df.index:
-                purchase_idx = df.index.get_loc(purchase_month)
-                purchase_month_str = purchase_month.strftime('%Y-%m-%d')
-                
-                # Get savings value right before purchase
-                pre_purchase_savings = df['CumulativeSavings'].iloc[purchase_idx]
-                
-                # Get savings value right after purchase (after down payment and fees)
-                post_purchase_savings = pre_purchase_savings - total_cash_outlay
-                
-                # Add markers for pre and post purchase
-                fig_events.add_trace(go.Scatter(
-                    x=[purchase_month_str],
-                    y=[pre_purchase_savings],
-                    name='购房前储蓄',
-                    mode='markers',
-                    marker=dict(size=12, color='orange', symbol='circle')
-                ))
-                
-                fig_events.add_trace(go.Scatter(
-                    x=[purchase_month_str],
-                    y=[post_purchase_savings],
-                    name='购房后储蓄',
-                    mode='markers',
-                    marker=dict(size=12, color='red', symbol='circle')
-                ))
-                
-                # Add annotation for housing purchase
-                fig_events.add_annotation(
-                    x=purchase_month_str,
-                    y=(pre_purchase_savings + post_purchase_savings) / 2,
-                    text=f"购房支出: ${total_cash_outlay:,.2f}",
-                    showarrow=True,
-                    arrowhead=2,
-                    arrowsize=1.5,
-                    arrowwidth=2,
-                    arrowcolor="red",
-                    ax=50,
-                    ay=0
-                )
-                
-                # Add a vertical line at purchase date
-                fig_events.add_shape(
-                    type="line",
-                    x0=purchase_month_str,
-                    y0=0,
-                    x1=purchase_month_str,
-                    y1=pre_purchase_savings,
-                    line=dict(color="red", width=1, dash="dash")
-                )
-        
-        # Add markers and annotations for child-related events
-        child_birth_date_dt = pd.to_datetime(child_birth_date)
-        
-        # Find significant child-related events
-        child_events = []
-        
-        # Birth event
-        if child_status in ["已出生", "预产期"]:
-            birth_month = child_birth_date_dt.replace(day=1)
-            if birth_month in df.index:
-                child_events.append({
-                    "date": birth_month,
-                    "date_str": birth_month.strftime('%Y-%m-%d'),
-                    "name": "宝宝出生",
-                    "symbol": "star",
-                    "color": "purple"
-                })
-        
-        # Childcare start (around 6 months)
-        childcare_start = child_birth_date_dt + pd.DateOffset(months=6)
-        childcare_start = childcare_start.replace(day=1)
-        if childcare_start in df.index:
-            child_events.append({
-                "date": childcare_start,
-                "date_str": childcare_start.strftime('%Y-%m-%d'),
-                "name": "开始托儿所",
-                "symbol": "triangle-up",
-                "color": "blue"
-            })
-        
-        # Preschool start (around 4 years)
-        preschool_start = child_birth_date_dt + pd.DateOffset(months=48)
-        preschool_start = preschool_start.replace(day=1)
-        if preschool_start in df.index:
-            child_events.append({
-                "date": preschool_start,
-                "date_str": preschool_start.strftime('%Y-%m-%d'),
-                "name": "开始学前班",
-                "symbol": "triangle-up",
-                "color": "green"
-            })
-        
-        # Primary school start (around 7 years)
-        primary_start = child_birth_date_dt + pd.DateOffset(months=84)
-        primary_start = primary_start.replace(day=1)
-        if primary_start in df.index:
-            child_events.append({
-                "date": primary_start,
-                "date_str": primary_start.strftime('%Y-%m-%d'),
-                "name": "开始小学",
-                "symbol": "triangle-up",
-                "color": "orange"
-            })
-        
-        # Add one-time child expenses from user input
-        if st.session_state.one_time_expenses:
-            expense_df = pd.DataFrame(st.session_state.one_time_expenses)
-            expense_df['date'] = pd.to_datetime(expense_df['date'])
-            
-            for _, expense in expense_df.iterrows():
-                if expense['category'] in ["产检费用", "生育费用", "坐月子费用", "教育费用"]:
-                    expense_month = expense['date'].replace(day=1)
-                    if expense_month in df.index:
-                        child_events.append({
-                            "date": expense_month,
-                            "date_str": expense_month.strftime('%Y-%m-%d'),
-                            "name": expense['name'],
-                            "amount": expense['amount'],
-                            "symbol": "circle",
-                            "color": "red"
-                        })
-        
-        # Add child events to chart
-        for event in child_events:
-            if event["date"] in df.index:
-                event_idx = df.index.get_loc(event["date"])
-                savings_at_event = df['CumulativeSavings'].iloc[event_idx]
-                
-                # Add marker
-                fig_events.add_trace(go.Scatter(
-                    x=[event["date_str"]],  # Use string format
-                    y=[savings_at_event],
-                    name=event["name"],
-                    mode='markers',
-                    marker=dict(size=10, color=event["color"], symbol=event["symbol"])
-                ))
-                
-                # Add annotation
-                annotation_text = event["name"]
-                if "amount" in event:
-                    annotation_text += f": ${event['amount']:,.2f}"
-                    
-                fig_events.add_annotation(
-                    x=event["date_str"],
-                    y=savings_at_event,
-                    text=annotation_text,
-                    showarrow=True,
-                    arrowhead=1,
-                    ax=40,
-                    ay=-30
-                )
-        
-        fig_events.update_layout(
-            xaxis_title='日期',
-            yaxis_title='金额 (SGD)',
-            height=500,  # Make this chart taller
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-        )
-        
-        # Use try-except to handle potential errors with plotly
-        try:
-            st.plotly_chart(fig_events, use_container_width=True)
-        except Exception as e:
-            st.error(f"图表渲染错误: {str(e)}")
-            st.info("请尝试调整输入参数或刷新页面。")
-        
-        # Cumulative Savings and Total Assets
-        st.subheader("累计储蓄与总资产")
-        fig3 = go.Figure()
-        
-        # Add a marker for initial funds
-        fig3.add_trace(go.Scatter(
-            x=[initial_date_str],  # Use string format
-            y=[initial_funds],
-            name='初始资金',
-            mode='markers',
-            marker=dict(size=12, color='green', symbol='diamond')
+            arrowhead=2,
+            arrowsize=1.5,
+            arrowwidth=2,
+            arrowcolor="red",
+            ax=50,
+            ay=0
         ))
         
-        # Add cumulative savings line
-        fig3.add_trace(go.Scatter(
-            x=date_strings,  # Use string format
-            y=df['CumulativeSavings'],
-            name='累计储蓄',
-            line=dict(color='blue', width=3)
+        # Add a vertical line at purchase date
+        shapes.append(dict(
+            type="line",
+            x0=purchase_month,
+            y0=0,
+            x1=purchase_month,
+            y1=pre_purchase_savings,
+            line=dict(color="red", width=1, dash="dash")
+        ))
+
+    # Add markers and annotations for child-related events
+    birth_period = pd.Period(child_birth_date, freq='M')
+    
+    # Child milestones as (months after birth, name, symbol, color):
+    # childcare (around 6 months), preschool (around 4 years), primary school (around 7 years)
+    milestones = [
+        (6, "开始托儿所", "triangle-up", "blue"),
+        (48, "开始学前班", "triangle-up", "green"),
+        (84, "开始小学", "triangle-up", "orange"),
+    ]
+    if child_status in ["已出生", "预产期"]:
+        milestones.insert(0, (0, "宝宝出生", "star", "purple"))
+    
+    child_events = [{"name": name, "symbol": symbol, "color": color} for _, name, symbol, color in milestones]
+    event_months = [birth_period.ordinal + offset for offset, _, _, _ in milestones]
+    
+    # Add one-time child expenses from user input
+    for name, amount, date, category in expense_records:
+        if category in ["产检费用", "生育费用", "坐月子费用", "教育费用"]:
+            child_events.append({"name": name, "amount": amount, "symbol": "circle", "color": "red"})
+            event_months.append(pd.Period(date, freq='M').ordinal)
+    
+    # Resolve every event month to its row in one searchsorted over the monthly period ordinals,
+    # keeping only the events whose month is inside the projection
+    index_months = df.index.to_period('M').asi8
+    event_months = np.asarray(event_months, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(index_months, event_months), len(index_months) - 1)
+    in_range = index_months[positions] == event_months
+    savings_at_events = savings[positions]
+    
+    # Add child events to chart
+    for event, event_idx, savings_at_event, found in zip(child_events, positions, savings_at_events, in_range):
+        if not found:
+            continue
+        event_date = df.index[event_idx]
+        
+        # Add marker
+        event_traces.append(dict(
+            type='scattergl',
+            x=[event_date],
+            y=[savings_at_event],
+            name=event["name"],
+            mode='markers',
+            marker=dict(size=10, color=event["color"], symbol=event["symbol"])
         ))
         
-        # Add property equity line if housing is included
-        if housing_status in ["已购房", "计划购房"]:
-            fig3.add_trace(go.Scatter(
-                x=date_strings,  # Use string format
-                y=df['PropertyEquity'],
-                name='房产净值',
-                line=dict(color='orange', width=2)
-            ))
+        # Add annotation
+        annotation_text = event["name"]
+        if "amount" in event:
+            annotation_text += f": ${event['amount']:,.2f}"
             
-            # Add total assets line
-            fig3.add_trace(go.Scatter(
-                x=date_strings,  # Use string format
-                y=df['TotalAssets'],
-                name='总资产',
-                line=dict(color='red', width=3)
-            ))
-        
-        # Add annotation for initial funds
-        fig3.add_annotation(
-            x=initial_date_str,
-            y=initial_funds,
-            text=f"初始资金: ${initial_funds:,.2f}",
+        annotations.append(dict(
+            x=event_date,
+            y=savings_at_event,
+            text=annotation_text,
             showarrow=True,
             arrowhead=1,
-            ax=-40,
-            ay=-40
-        )
-        
-        # Add markers and annotations for housing purchase impact on savings
-        if housing_status == "计划购房":
-            house_purchase_date_dt = pd.to_datetime(house_purchase_date)
-            purchase_month = house_purchase_date_dt.replace(day=1)
-            
-            if purchase_month in df.index:
-                purchase_idx = df.index.get_loc(purchase_month)
-                purchase_month_str = purchase_month.strftime('%Y-%m-%d')
-                
-                # Get values right before purchase
-                if purchase_idx > 0:
-                    pre_purchase_month = df.index[purchase_idx - 1]
-                    pre_purchase_month_str = pre_purchase_month.strftime('%Y-%m-%d')
-                    pre_purchase_savings = df['CumulativeSavings'].iloc[purchase_idx - 1]
-                else:
-                    pre_purchase_month = purchase_month
-                    pre_purchase_month_str = purchase_month_str
-                    pre_purchase_savings = df['CumulativeSavings'].iloc[purchase_idx] + total_cash_outlay
-                
-                # Get values at purchase
-                purchase_savings = df['CumulativeSavings'].iloc[purchase_idx]
-                purchase_equity = df['PropertyEquity'].iloc[purchase_idx]
-                purchase_assets = df['TotalAssets'].iloc[purchase_idx]
-                
-                # Add markers for the drop in savings
-                fig3.add_trace(go.Scatter(
-                    x=[pre_purchase_month_str, purchase_month_str],
-                    y=[pre_purchase_savings, purchase_savings],
-                    name='购房储蓄变化',
-                    mode='lines+markers',
-                    line=dict(color='red', width=4, dash='dash'),
-                    marker=dict(size=10, color=['green', 'red'])
-                ))
-                
-                # Add annotation for the drop
-                fig3.add_annotation(
-                    x=purchase_month_str,  # Simplified to avoid date arithmetic
-                    y=(pre_purchase_savings + purchase_savings) / 2,
-                    text=f"购房支出: ${total_cash_outlay:,.2f}",
-                    showarrow=True,
-                    arrowhead=2,
-                    arrowsize=1.5,
-                    arrowwidth=2,
-                    arrowcolor="red",
-                    ax=0,
-                    ay=-40
-                )
-                
-                # Add annotation for property equity gained
-                fig3.add_annotation(
-                    x=purchase_month_str,
-                    y=purchase_equity / 2,
-                    text=f"获得房产净值: ${purchase_equity:,.2f}",
-                    showarrow=True,
-                    arrowhead=1,
-                    ax=40,
-                    ay=0,
-                    font=dict(color="orange")
-                )
-                
-                # Add a vertical line at purchase date
-                fig3.add_shape(
-                    type="line",
-                    x0=purchase_month_str,
-                    y0=0,
-                    x1=purchase_month_str,
-                    y1=max(pre_purchase_savings, purchase_assets),
-                    line=dict(color="black", width=1, dash="dash")
-                )
-                
-                # Add an arrow showing the conversion from cash to equity
-                fig3.add_annotation(
-                    x=purchase_month_str,
-                    y=purchase_savings + (purchase_equity / 2),
-                    text="现金转换为房产净值",
-                    showarrow=True,
-                    arrowhead=2,
-                    arrowsize=1.5,
-                    arrowwidth=2,
-                    arrowcolor="orange",
-                    ax=0,
-                    ay=-60
-                )
-        
-        fig3.update_layout(
-            xaxis_title='日期',
-            yaxis_title='金额 (SGD)',
-            height=500,  # Make this chart taller
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-        )
-        
-        try:
-            st.plotly_chart(fig3, use_container_width=True)
-        except Exception as e:
-            st.error(f"图表渲染错误: {str(e)}")
-            st.info("请尝试调整输入参数或刷新页面。")
+            ax=40,
+            ay=-30
+        ))
     
-    with col2:
-        # Expense Breakdown
-        st.subheader("支出明细")
-        
-        # Group by year and calculate averages
-        yearly_expenses = df.groupby('Year').agg({
-            'MonthlyMortgage': 'mean',
-            'MonthlyExpenses': 'mean',
-            'MonthlyChildExpenses': 'mean',
-            'TotalEducationExpenses': 'mean',
-            'MonthlyInsurance': 'mean',
-            'MonthlyTax': 'mean',
-            'OneTimeExpenses': 'sum'
-        }).reset_index()
-        
-        # Create a copy of the dataframe for the chart that excludes housing one-time expenses
-        chart_expenses = yearly_expenses.copy()
-        
-        # If housing columns exist, exclude housing one-time expenses from the chart
-        if 'HousingDownPayment' in df.columns and 'HousingTaxesFees' in df.columns:
-            # Calculate housing expenses by year
-            housing_expenses = df.groupby('Year').agg({
-                'HousingDownPayment': 'sum',
-                'HousingTaxesFees': 'sum'
-            }).reset_index()
-            
-            # Subtract housing expenses from one-time expenses for the chart
-            for idx, row in housing_expenses.iterrows():
-                year = row['Year']
-                housing_total = row['HousingDownPayment'] + row['HousingTaxesFees']
-                if housing_total > 0:
-                    year_idx = chart_expenses[chart_expenses['Year'] == year].index
-                    if len(year_idx) > 0:
-                        chart_expenses.loc[year_idx, 'OneTimeExpenses'] -= housing_total
-        
-        # Create a stacked bar chart
-        expense_categories = [
-            'MonthlyMortgage', 'MonthlyExpenses', 'MonthlyChildExpenses',
-            'TotalEducationExpenses', 'MonthlyInsurance', 'MonthlyTax', 'OneTimeExpenses'
-        ]
-        
-        category_names = {
-            'MonthlyMortgage': '房贷',
-            'MonthlyExpenses': '常规支出',
-            'MonthlyChildExpenses': '小孩支出',
-            'TotalEducationExpenses': '教育支出',
-            'MonthlyInsurance': '保险',
-            'MonthlyTax': '税款',
-            'OneTimeExpenses': '一次性支出'
-        }
-        
-        fig2 = go.Figure()
+    fig_events = go.Figure(data=event_traces, layout=dict(
+        annotations=annotations,
+        shapes=shapes,
+        xaxis_title='日期',
+        yaxis_title='金额 (SGD)',
+        height=500,  # Make this chart taller
+        margin=dict(l=20, r=20, t=30, b=20),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    ))
+    
+    return fig_events
+
+# Cumulative savings, property equity and total assets around the housing purchase
+@st.cache_data(max_entries=16)
+def make_assets_figure(df, initial_funds, housing_status, purchase_month, total_cash_outlay):
+    chart_dates, initial_date = get_chart_dates(df.index)
+    savings = df['CumulativeSavings'].to_numpy()
+    
+    annotations, shapes = [], []  # Layout annotations and shapes, passed with the traces at the end
+    asset_traces = []
+    
+    # Add a marker for initial funds
+    asset_traces.append(dict(
+        type='scattergl',
+        x=[initial_date],
+        y=[initial_funds],
+        name='初始资金',
+        mode='markers',
+        marker=dict(size=12, color='green', symbol='diamond')
+    ))
+    
+    # Add cumulative savings line
+    asset_traces.append(dict(
+        type='scattergl',
+        **line_xy(chart_dates, savings),
+        name='累计储蓄',
+        line=dict(color='blue', width=3)
+    ))
+    
+    # Add property equity line if housing is included
+    if housing_status in ["已购房", "计划购房"]:
+        asset_traces.append(dict(
+            type='scattergl',
+            **line_xy(chart_dates, df['PropertyEquity'].to_numpy()),
+            name='房产净值',
+            line=dict(color='orange', width=2)
+        ))
         
-        for category in expense_categories:
-            fig2.add_trace(go.Bar(
-                x=chart_expenses['Year'],
-                y=chart_expenses[category],
-                name=category_names[category]
-            ))
+        # Add total assets line
+        asset_traces.append(dict(
+            type='scattergl',
+            **line_xy(chart_dates, df['TotalAssets'].to_numpy()),
+            name='总资产',
+            line=dict(color='red', width=3)
+        ))
+    
+    # Add annotation for initial funds
+    annotations.append(dict(
+        x=initial_date,
+        y=initial_funds,
+        text=f"初始资金: ${initial_funds:,.2f}",
+        showarrow=True,
+        arrowhead=1,
+        ax=-40,
+        ay=-40
+    ))
+    
+    # Add markers and annotations for housing purchase impact on savings
+    purchase_idx = month_position(df.index, purchase_month)
+    if purchase_idx is not None:
+        # Get values at purchase from a single row fetch
+        purchase_row = df.iloc[purchase_idx]
+        purchase_savings = purchase_row['CumulativeSavings']
+        purchase_equity = purchase_row['PropertyEquity']
+        purchase_assets = purchase_row['TotalAssets']
+        
+        # Get values right before purchase
+        if purchase_idx > 0:
+            pre_purchase_month = df.index[purchase_idx - 1]
+            pre_purchase_savings = savings[purchase_idx - 1]
+        else:
+            pre_purchase_month = purchase_month
+            pre_purchase_savings = purchase_savings + total_cash_outlay
+        
+        # Add markers for the drop in savings
+        asset_traces.append(dict(
+            type='scattergl',
+            x=[pre_purchase_month, purchase_month],
+            y=[pre_purchase_savings, purchase_savings],
+            name='购房储蓄变化',
+            mode='lines+markers',
+            line=dict(color='red', width=4, dash='dash'),
+            marker=dict(size=10, color=['green', 'red'])
+        ))
         
-        fig2.update_layout(
-            barmode='stack',
-            xaxis_title='年份',
-            yaxis_title='平均月支出 (SGD)',
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-            height=400,
-            margin=dict(l=20, r=20, t=30, b=20)
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+        # Add annotation for the drop
+        annotations.append(dict(
+            x=purchase_month,  # Simplified to avoid date arithmetic
+            y=(pre_purchase_savings + purchase_savings) / 2,
+            text=f"购房支出: ${total_cash_outlay:,.2f}",
+            showarrow=True,
+            arrowhead=2,
+            arrowsize=1.5,
+            arrowwidth=2,
+            arrowcolor="red",
+            ax=0,
+            ay=-40
+        ))
         
-        # Child expenses over time
-        st.subheader("小孩相关支出随时间变化")
+        # Add annotation for property equity gained
+        annotations.append(dict(
+            x=purchase_month,
+            y=purchase_equity / 2,
+            text=f"获得房产净值: ${purchase_equity:,.2f}",
+            showarrow=True,
+            arrowhead=1,
+            ax=40,
+            ay=0,
+            font=dict(color="orange")
+        ))
         
-        # Create a line chart for child expenses
-        fig4 = go.Figure()
+        # Add a vertical line at purchase date
+        shapes.append(dict(
+            type="line",
+            x0=purchase_month,
+            y0=0,
+            x1=purchase_month,
+            y1=max(pre_purchase_savings, purchase_assets),
+            line=dict(color="black", width=1, dash="dash")
+        ))
         
+        # Add an arrow showing the conversion from cash to equity
+        annotations.append(dict(
+            x=purchase_month,
+            y=purchase_savings + (purchase_equity / 2),
+            text="现金转换为房产净值",
+            showarrow=True,
+            arrowhead=2,
+            arrowsize=1.5,
+            arrowwidth=2,
+            arrowcolor="orange",
+            ax=0,
+            ay=-60
+        ))
+
+    fig3 = go.Figure(data=asset_traces, layout=dict(
+        annotations=annotations,
+        shapes=shapes,
+        xaxis_title='日期',
+        yaxis_title='金额 (SGD)',
+        height=500,  # Make this chart taller
+        margin=dict(l=20, r=20, t=30, b=20),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    ))
+    
+    return fig3
+
+# Stacked yearly averages of each expense category, excluding the housing purchase itself
+@st.cache_data(max_entries=16)
+def make_expense_breakdown_figure(yearly_expenses):
+    # Create a stacked bar chart
+    expense_categories = [
+        'MonthlyMortgage', 'MonthlyExpenses', 'MonthlyChildExpenses',
+        'TotalEducationExpenses', 'MonthlyInsurance', 'MonthlyTax', 'OneTimeExpenses'
+    ]
+    
+    category_names = {
+        'MonthlyMortgage': '房贷',
+        'MonthlyExpenses': '常规支出',
+        'MonthlyChildExpenses': '小孩支出',
+        'TotalEducationExpenses': '教育支出',
+        'MonthlyInsurance': '保险',
+        'MonthlyTax': '税款',
+        'OneTimeExpenses': '一次性支出'
+    }
+    
+    # Reshape to long format (one row per year and category) for a single px.bar call. The long
+    # frame is the only new allocation: yearly_expenses itself is not copied
+    long_expenses = yearly_expenses.melt(id_vars='Year', value_vars=expense_categories,
+                                         var_name='category', value_name='amount')
+    
+    # If housing columns exist, exclude housing one-time expenses from the chart
+    # (the one-time rows follow yearly_expenses' year order)
+    if 'HousingDownPayment' in yearly_expenses.columns and 'HousingTaxesFees' in yearly_expenses.columns:
+        housing_totals = (yearly_expenses['HousingDownPayment'] + yearly_expenses['HousingTaxesFees']).to_numpy()
+        long_expenses.loc[long_expenses['category'] == 'OneTimeExpenses', 'amount'] -= housing_totals
+    
+    long_expenses['category'] = long_expenses['category'].map(category_names)
+    fig2 = px.bar(long_expenses, x='Year', y='amount', color='category', barmode='stack')
+    
+    fig2.update_layout(
+        xaxis_title='年份',
+        xaxis_type='category',  # One bar per year, with no numeric range or tick inference
+        yaxis_title='平均月支出 (SGD)',
+        legend=dict(title_text='', orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        height=400,
+        margin=dict(l=20, r=20, t=30, b=20)
+    )
+    
+    return fig2
+
+# Child-related expense traces: regular and education lines plus one-time expense markers
+def child_expense_traces(df):
+    dates = df.index.to_numpy()
+    
+    child_traces = [
         # Regular child expenses
-        fig4.add_trace(go.Scatter(
-            x=df.index,
-            y=df['MonthlyChildExpenses'],
+        dict(
+            type='scattergl',
+            **line_xy(dates, df['MonthlyChildExpenses'].to_numpy()),
             name='常规支出',
             line=dict(color='purple', width=2)
-        ))
-        
+        ),
         # Education expenses
-        fig4.add_trace(go.Scatter(
-            x=df.index,
-            y=df['TotalEducationExpenses'],
+        dict(
+            type='scattergl',
+            **line_xy(dates, df['TotalEducationExpenses'].to_numpy()),
             name='教育支出',
             line=dict(color='orange', width=2)
-        ))
-        
-        # One-time expenses
-        fig4.add_trace(go.Scatter(
-            x=df.index,
-            y=df['OneTimeExpenses'],
+        )
+    ]
+    
+    # One-time expenses: only the months that have any are plotted, and the trace is
+    # skipped entirely when there are none
+    one_time = df['OneTimeExpenses'].to_numpy()
+    has_one_time = one_time != 0
+    if has_one_time.any():
+        child_traces.append(dict(
+            type='scattergl',
+            x=dates[has_one_time],
+            y=one_time[has_one_time],
             name='一次性支出',
             mode='markers',
             marker=dict(size=10, color='red')
         ))
-        
-        fig4.update_layout(
-            xaxis_title='日期',
-            yaxis_title='金额 (SGD)',
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-            height=400,
-            margin=dict(l=20, r=20, t=30, b=20)
-        )
-        st.plotly_chart(fig4, use_container_width=True)
+    
+    return child_traces
 
-        # Add a new chart showing asset composition over time if housing is included
-        if housing_status in ["已购房", "计划购房"]:
-            st.subheader("资产构成随时间变化")
-            
-            # Create a stacked area chart for asset composition
-            fig7 = go.Figure()
-            
-            # Add savings area
-            fig7.add_trace(go.Scatter(
-                x=df.index,
-                y=df['CumulativeSavings'],
+@st.cache_data(max_entries=16)
+def make_asset_composition_figure(df):
+    dates = df.index.to_numpy()
+    
+    # Create a stacked area chart for asset composition
+    # (kept as SVG 'scatter' traces: WebGL traces do not support stackgroup)
+    fig7 = go.Figure(
+        data=[
+            # Savings area
+            dict(
+                type='scatter',
+                x=dates,
+                y=df['CumulativeSavings'].to_numpy(),
                 name='现金储蓄',
                 mode='lines',
                 line=dict(width=0),
                 fill='tozeroy',
                 stackgroup='assets'
-            ))
-            
-            # Add property equity area
-            fig7.add_trace(go.Scatter(
-                x=df.index,
-                y=df['PropertyEquity'],
+            ),
+            # Property equity area
+            dict(
+                type='scatter',
+                x=dates,
+                y=df['PropertyEquity'].to_numpy(),
                 name='房产净值',
                 mode='lines',
                 line=dict(width=0),
                 fill='tonexty',
                 stackgroup='assets'
-            ))
-            
-            fig7.update_layout(
-                xaxis_title='日期',
-                yaxis_title='金额 (SGD)',
-                height=400,
-                margin=dict(l=20, r=20, t=30, b=20)
             )
-            st.plotly_chart(fig7, use_container_width=True)
-            
-            # Add a pie chart showing final asset composition
-            st.subheader("最终资产构成")
+        ],
+        layout=dict(
+            xaxis_title='日期',
+            yaxis_title='金额 (SGD)',
+            height=400,
+            margin=dict(l=20, r=20, t=30, b=20)
+        )
+    )
+    
+    return fig7
+
+@st.cache_data(max_entries=16)
+def make_final_assets_figure(df):
+    final_savings = df['CumulativeSavings'].iloc[-1]
+    final_property_equity = df['PropertyEquity'].iloc[-1]
+    
+    asset_labels = ['现金储蓄', '房产净值']
+    asset_values = [final_savings, final_property_equity]
+    
+    fig8 = px.pie(
+        values=asset_values,
+        names=asset_labels,
+        title=f"6年后资产构成 (总计: ${final_savings + final_property_equity:,.2f})"
+    )
+    fig8.update_traces(textposition='inside', textinfo='percent+label+value')
+    fig8.update_layout(height=300)
+    
+    return fig8
+
+# Monthly cash flow traces: income, expenses and savings lines plus large one-time expense markers
+def cashflow_traces(df, monthly_income, expense_records):
+    chart_dates, _ = get_chart_dates(df.index)
+    monthly_savings = df['MonthlySavings'].to_numpy()
+    
+    cashflow_traces = []
+    
+    # Add income line
+    cashflow_traces.append(dict(
+        type='scattergl',
+        **line_xy(chart_dates, monthly_income + df['Bonus'].to_numpy()),
+        name='总收入',
+        line=dict(color='green', width=2)
+    ))
+    
+    # Add expenses line
+    cashflow_traces.append(dict(
+        type='scattergl',
+        **line_xy(chart_dates, df['TotalMonthlyExpenses'].to_numpy()),
+        name='总支出',
+        line=dict(color='red', width=2)
+    ))
+    
+    # Add monthly savings line
+    cashflow_traces.append(dict(
+        type='scattergl',
+        **line_xy(chart_dates, monthly_savings),
+        name='月度储蓄',
+        line=dict(color='blue', width=2)
+    ))
+    
+    # Add markers for significant one-time expenses (over 5000) inside the projection,
+    # resolving every expense month to its row with one get_indexer call
+    if expense_records:
+        names, amounts, dates, _ = zip(*sorted(expense_records, key=lambda record: record[2]))
+        expense_months = pd.DatetimeIndex(np.array(dates, dtype='datetime64[D]').astype('datetime64[M]'))
+        expense_idx = df.index.get_indexer(expense_months)
+        large = (expense_idx >= 0) & (np.asarray(amounts, dtype=np.float64) > 5000)
+        
+        # All large expenses share one marker trace; each marker's name is shown on hover
+        if large.any():
+            large_idx = expense_idx[large]
+            cashflow_traces.append(dict(
+                type='scattergl',
+                x=df.index[large_idx].to_numpy(),
+                y=monthly_savings[large_idx],
+                text=np.asarray(names, dtype=object)[large],
+                name='大额一次性支出',
+                mode='markers',
+                marker=dict(size=10, color='red', symbol='x'),
+                hovertemplate='%{text}<br>$%{y:,.0f}<extra></extra>'
+            ))
+    
+    return cashflow_traces
+
+# Child-related expenses (top) and monthly cash flow (bottom) share the monthly date axis, so they
+# are drawn as one two-row figure: one serialization and one Plotly.js mount instead of two
+@st.cache_data(max_entries=16)
+def make_monthly_flows_figure(df, monthly_income, expense_records):
+    fig_flows = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                              subplot_titles=("小孩相关支出随时间变化", "月度现金流"))
+    fig_flows.add_traces(child_expense_traces(df), rows=1, cols=1)
+    fig_flows.add_traces(cashflow_traces(df, monthly_income, expense_records), rows=2, cols=1)
+    
+    # Add a horizontal line at zero in the cash flow row
+    fig_flows.add_shape(
+        type="line",
+        x0=df.index[0],
+        y0=0,
+        x1=df.index[-1],
+        y1=0,
+        line=dict(color="black", width=1, dash="dash"),
+        row=2,
+        col=1
+    )
+    
+    fig_flows.update_xaxes(title_text='日期', row=2, col=1)
+    fig_flows.update_yaxes(title_text='金额 (SGD)')
+    fig_flows.update_layout(
+        height=800,
+        margin=dict(l=20, r=20, t=50, b=20),
+        legend=dict(orientation='h', yanchor='bottom', y=1.05, xanchor='right', x=1)
+    )
+    
+    return fig_flows
+
+# Keep each figure in session state with the inputs it was built from, so a rerun with unchanged
+# inputs redraws the very same figure object; a st.cache_data hit would unpickle (and re-validate)
+# a fresh copy every time. The projection frames are compared by identity, since an unchanged
+# projection is reused from session state as the same object.
+def session_figure(builder, *args):
+    figures = st.session_state.setdefault('figures', {})
+    cached = figures.get(builder.__name__)
+    if cached is None or not all(
+        old is new or (not isinstance(new, pd.DataFrame) and not isinstance(old, pd.DataFrame) and old == new)
+        for old, new in zip(cached[0], args)
+    ):
+        cached = figures[builder.__name__] = (args, builder(*args))
+    return cached[1]
+
+# Charts are drawn inside a fragment: interactions within it rerun only the charts,
+# not the projection and the rest of the page (requires Streamlit >= 1.37)
+@st.fragment
+def render_charts(df, yearly_expenses):
+    st.header("财务图表分析")
+    
+    # Streamlit runs every tab body on each rerun, so the figures are only built once the charts
+    # are switched on; flipping the toggle reruns just this fragment
+    if not st.toggle("显示图表", key="show_charts"):
+        st.info("打开「显示图表」以生成财务图表")
+        return
+    
+    # Inputs the figures depend on besides the projection itself
+    purchase_month = None
+    if housing_status == "计划购房":
+        purchase_month = pd.Period(house_purchase_date, freq='M').to_timestamp()
+    expense_records = tuple((expense["name"], expense["amount"], expense["date"], expense["category"])
+                            for expense in st.session_state.one_time_expenses)
+    
+    # Only the selected chart group is built: unlike st.tabs, whose bodies all run on every rerun,
+    # the unselected figures are skipped entirely, and switching groups reruns just this fragment
+    chart_view = st.radio("图表分组", ["储蓄与资产", "支出明细", "小孩支出与现金流"], horizontal=True,
+                          key="chart_view", label_visibility="collapsed")
+    
+    if chart_view == "储蓄与资产":
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Cash Savings with Key Events
+            st.subheader("现金储蓄变化与重大事件")
             
-            final_savings = df['CumulativeSavings'].iloc[-1]
-            final_property_equity = df['PropertyEquity'].iloc[-1]
+            fig_events = session_figure(make_events_figure, df, initial_funds, purchase_month, total_cash_outlay,
+                                        child_status, child_birth_date, expense_records)
             
-            asset_labels = ['现金储蓄', '房产净值']
-            asset_values = [final_savings, final_property_equity]
+            # Use try-except to handle potential errors with plotly
+            try:
+                st.plotly_chart(fig_events, use_container_width=True)
+            except Exception as e:
+                st.error(f"图表渲染错误: {str(e)}")
+                st.info("请尝试调整输入参数或刷新页面。")
             
-            fig8 = px.pie(
-                values=asset_values,
-                names=asset_labels,
-                title=f"6年后资产构成 (总计: ${final_savings + final_property_equity:,.2f})"
-            )
-            fig8.update_traces(textposition='inside', textinfo='percent+label+value')
-            fig8.update_layout(height=300)
+            # Cumulative Savings and Total Assets
+            st.subheader("累计储蓄与总资产")
+            fig3 = session_figure(make_assets_figure, df, initial_funds, housing_status, purchase_month, total_cash_outlay)
             
-            st.plotly_chart(fig8, use_container_width=True)
-
-        # Add a new chart showing monthly cash flow
-        st.subheader("月度现金流")
-        
-        fig_cashflow = go.Figure()
-        
-        # Add income line
-        fig_cashflow.add_trace(go.Scatter(
-            x=date_strings,  # Use string format
-            y=df['MonthlyIncome'] + df['Bonus'],
-            name='总收入',
-            line=dict(color='green', width=2)
-        ))
-        
-        # Add expenses line
-        fig_cashflow.add_trace(go.Scatter(
-            x=date_strings,  # Use string format
-            y=df['TotalMonthlyExpenses'],
-            name='总支出',
-            line=dict(color='red', width=2)
-        ))
-        
-        # Add monthly savings line
-        fig_cashflow.add_trace(go.Scatter(
-            x=date_strings,  # Use string format
-            y=df['MonthlySavings'],
-            name='月度储蓄',
-            line=dict(color='blue', width=2)
-        ))
-        
-        # Add a horizontal line at zero
-        fig_cashflow.add_shape(
-            type="line",
-            x0=date_strings[0],
-            y0=0,
-            x1=date_strings[-1],
-            y1=0,
-            line=dict(color="black", width=1, dash="dash")
-        )
+            try:
+                st.plotly_chart(fig3, use_container_width=True)
+            except Exception as e:
+                st.error(f"图表渲染错误: {str(e)}")
+                st.info("请尝试调整输入参数或刷新页面。")
+        
+        with col2:
+            # Add a new chart showing asset composition over time if housing is included
+            if housing_status in ["已购房", "计划购房"]:
+                st.subheader("资产构成随时间变化")
+                
+                fig7 = session_figure(make_asset_composition_figure, df)
+                st.plotly_chart(fig7, use_container_width=True)
+                
+                # Add a pie chart showing final asset composition
+                st.subheader("最终资产构成")
+                
+                fig8 = session_figure(make_final_assets_figure, df)
+                st.plotly_chart(fig8, use_container_width=True)
+            else:
+                st.info("已购房或计划购房时显示资产构成图表")
+    
+    elif chart_view == "支出明细":
+        # Expense Breakdown
+        st.subheader("支出明细")
         
-        # Add markers for significant one-time expenses
-        if 'expense_df' in locals():
-            for _, expense in expense_df.iterrows():
-                expense_month = expense['date'].replace(day=1)
-                if expense_month in df.index:
-                    expense_idx = df.index.get_loc(expense_month)
-                    expense_month_str = expense_month.strftime('%Y-%m-%d')
-                    savings_at_expense = df['MonthlySavings'].iloc[expense_idx]
-                    
-                    # Add marker for large expenses (over 5000)
-                    if expense['amount'] > 5000:
-                        fig_cashflow.add_trace(go.Scatter(
-                            x=[expense_month_str],
-                            y=[savings_at_expense],
-                            name=expense['name'],
-                            mode='markers',
-                            marker=dict(size=10, color='red', symbol='x')
-                        ))
+        fig2 = session_figure(make_expense_breakdown_figure, yearly_expenses)
+        st.plotly_chart(fig2, use_container_width=True)
+    
+    else:
+        # Child expenses over time and monthly cash flow, as one two-row chart
+        st.subheader("小孩支出与月度现金流")
         
-        fig_cashflow.update_layout(
-            xaxis_title='日期',
-            yaxis_title='金额 (SGD)',
-            height=400,
-            margin=dict(l=20, r=20, t=30, b=20),
-            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-        )
+        fig_flows = session_figure(make_monthly_flows_figure, df, monthly_income, expense_records)
         
         try:
-            st.plotly_chart(fig_cashflow, use_container_width=True)
+            st.plotly_chart(fig_flows, use_container_width=True)
         except Exception as e:
             st.error(f"图表渲染错误: {str(e)}")
             st.info("请尝试调整输入参数或刷新页面。")
 
+with tab3:
+    render_charts(df, yearly_expenses)
+
 # Footer
 st.markdown("---")
 st.markdown("© 2025 Singapore Family Finance Planner Done By Shihao | 此应用仅供参考，不构成财务建议") 
\ No newline at end of file